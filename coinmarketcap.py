@@ -35,8 +35,26 @@ from helpers.threecommas import (
 def load_config():
     """Create default or load existing config file."""
 
+    # Skip parsing the file again when it has not been modified since the last load
+    try:
+        mtime = os.stat(f"{datadir}/{program}.ini").st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime is not None and mtime == configcache["mtime"]:
+        return configcache["config"]
+
     cfg = configparser.ConfigParser()
     if cfg.read(f"{datadir}/{program}.ini"):
+        configcache["mtime"] = mtime
+        configcache["config"] = cfg
+        configcache["cmcsections"] = [
+            section for section in cfg.sections() if section.startswith("cmc_")
+        ]
+        configcache["othersections"] = [
+            section for section in cfg.sections()
+            if not section.startswith("cmc_") and section != "settings"
+        ]
         return cfg
 
     cfg["settings"] = {
@@ -331,6 +349,14 @@ if args.blacklist:
 else:
     blacklistfile = None
 
+# Cache of the parsed configuration, refreshed when the file changes
+configcache = {
+    "mtime": None,
+    "config": None,
+    "cmcsections": [],
+    "othersections": [],
+}
+
 # Create or load configuration file
 config = load_config()
 if not config:
@@ -382,9 +408,11 @@ cursor = db.cursor()
 # Refresh coin pairs based on CoinMarketCap data
 while True:
 
-    # Reload config files and refetch data to catch changes
-    config = load_config()
-    logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")
+    # Reload config file, which is only parsed again when it has been changed
+    loadedconfig = load_config()
+    if loadedconfig is not config:
+        config = loadedconfig
+        logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")
 
     # Configuration settings
     timeint = int(config.get("settings", "timeinterval"))
@@ -395,84 +423,84 @@ while True:
     # Current time to determine which sections to process
     starttime = int(time.time())
 
-    for section in config.sections():
-        if section.startswith("cmc_"):
-            sectiontimeinterval = int(config.get(section, "timeinterval"))
-            nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
-
-            # Only process the section if it's time for the next interval, or
-            # time exceeds the check interval (clock has changed somehow)
-            if starttime >= nextprocesstime or (
-                    abs(nextprocesstime - starttime) > sectiontimeinterval
-            ):
-                # Bot configuration for section
-                botids = json.loads(config.get(section, "botids"))
-
-                # Download CoinMarketCap data
-                startnumber = int(config.get(section, "start-number"))
-                endnumber = 1 + (int(config.get(section, "end-number")) - startnumber)
-                convert = config.get(section, "max-percent-compared-to")
-
-                convertlist = ("BNB", "BTC", "ETH", "EUR", "USD")
-                if convert not in convertlist:
-                    logger.error(
-                        f"Percent change ('{convert}') must be one of the following: "
-                        f"{convertlist}"
-                    )
-                    continue
+    for section in configcache["cmcsections"]:
+        sectiontimeinterval = int(config.get(section, "timeinterval"))
+        nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
+
+        # Only process the section if it's time for the next interval, or
+        # time exceeds the check interval (clock has changed somehow)
+        if starttime >= nextprocesstime or (
+                abs(nextprocesstime - starttime) > sectiontimeinterval
+        ):
+            # Bot configuration for section
+            botids = json.loads(config.get(section, "botids"))
+
+            # Download CoinMarketCap data
+            startnumber = int(config.get(section, "start-number"))
+            endnumber = 1 + (int(config.get(section, "end-number")) - startnumber)
+            convert = config.get(section, "max-percent-compared-to")
+
+            convertlist = ("BNB", "BTC", "ETH", "EUR", "USD")
+            if convert not in convertlist:
+                logger.error(
+                    f"Percent change ('{convert}') must be one of the following: "
+                    f"{convertlist}"
+                )
+                continue
+
+            data = get_coinmarketcap_data(
+                logger, config.get("settings", "cmc-apikey"), startnumber, endnumber, convert
+            )
 
-                data = get_coinmarketcap_data(
-                    logger, config.get("settings", "cmc-apikey"), startnumber, endnumber, convert
+            # Check if CMC replied with an error
+            if data[0] != -1:
+                logger.error(
+                    f"Received error {data[0]}: {data[1]}. "
+                    f"Stop processing and retry in 24h again."
                 )
+                timeint = 86400
 
-                # Check if CMC replied with an error
-                if data[0] != -1:
-                    logger.error(
-                        f"Received error {data[0]}: {data[1]}. "
-                        f"Stop processing and retry in 24h again."
+                # And exit loop so we can wait 24h before trying again
+                break
+
+            # Get actual CMC data and process further
+            coinmarketcap_data = data[2]
+
+            if coinmarketcap_data:
+                # Filter data according to configuration
+                coinmarketcap_data = coinmarketcap_filter(coinmarketcap_data, section)
+
+                # Walk through all bots configured
+                for bot in botids:
+                    error, data = api.request(
+                        entity="bots",
+                        action="show",
+                        action_id=str(bot),
                     )
-                    timeint = 86400
-
-                    # And exit loop so we can wait 24h before trying again
-                    break
-
-                # Get actual CMC data and process further
-                coinmarketcap_data = data[2]
-
-                if coinmarketcap_data:
-                    # Filter data according to configuration
-                    coinmarketcap_data = coinmarketcap_filter(coinmarketcap_data, section)
-
-                    # Walk through all bots configured
-                    for bot in botids:
-                        error, data = api.request(
-                            entity="bots",
-                            action="show",
-                            action_id=str(bot),
-                        )
-                        if data:
-                            coinmarketcap_pairs(data, coinmarketcap_data)
+                    if data:
+                        coinmarketcap_pairs(data, coinmarketcap_data)
+                    else:
+                        if error and "msg" in error:
+                            logger.error("Error occurred updating bots: %s" % error["msg"])
                         else:
-                            if error and "msg" in error:
-                                logger.error("Error occurred updating bots: %s" % error["msg"])
-                            else:
-                                logger.error("Error occurred updating bots")
-
-                    # Determine new time to process this section
-                    newtime = starttime + sectiontimeinterval
-                    set_next_process_time(db, "sections", "sectionid", section, newtime)
-                else:
-                    logger.error("Error occurred during fetch of CMC data")
+                            logger.error("Error occurred updating bots")
+
+                # Determine new time to process this section
+                newtime = starttime + sectiontimeinterval
+                set_next_process_time(db, "sections", "sectionid", section, newtime)
             else:
-                logger.debug(
-                    f"Section {section} will be processed after "
-                    f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
-                )
-        elif section != "settings":
-            logger.warning(
-                f"Section '{section}' not processed (prefix 'cmc_' missing)!",
-                False
+                logger.error("Error occurred during fetch of CMC data")
+        else:
+            logger.debug(
+                f"Section {section} will be processed after "
+                f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
             )
 
+    for section in configcache["othersections"]:
+        logger.warning(
+            f"Section '{section}' not processed (prefix 'cmc_' missing)!",
+            False
+        )
+
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -10,12 +10,19 @@ from logging.handlers import TimedRotatingFileHandler as _TimedRotatingFileHandl
 import apprise
 from apprise import NotifyFormat
 
+# Time the notification worker waits for more messages to send together, for
+# scripts that receive bursts of events
+NOTIFICATION_BATCH_SECONDS = 0.25
+
 class NotificationHandler:
     """Notification class."""
 
-    def __init__(self, program, enabled=False, notify_urls=None):
+    def __init__(self, program, enabled=False, notify_urls=None, batch_seconds=0):
         self.program = program
         self.message = ""
+        self.batch_seconds = batch_seconds
+        # Messages can be queued from worker threads, so guard the shared message
+        self.lock = threading.Lock()
 
         if enabled and notify_urls:
             self.apobj = apprise.Apprise()
@@ -35,25 +42,37 @@ class NotificationHandler:
     def process_queue(self):
         """Process the queue."""
         while True:
-            message, attachments = self.queue.get()
-            if attachments:
-                self.apobj.notify(body=message, attach=attachments, body_format=NotifyFormat.TEXT)
-            else:
-                self.apobj.notify(body=message, body_format=NotifyFormat.TEXT)
+            message = self.queue.get()
+
+            if self.batch_seconds > 0:
+                # Messages queued shortly after each other (a burst of events) are
+                # combined into one notification, instead of sending one per message
+                time.sleep(self.batch_seconds)
+                while not self.queue.empty():
+                    message += self.queue.get_nowait()
+                    self.queue.task_done()
+
+            message = f"[3C Cyber Bot-Helper {self.program}]\r\n \r\n" + message
+            self.apobj.notify(body=message, body_format=NotifyFormat.TEXT)
             self.queue.task_done()
 
     def queue_notification(self, message):
         """Queue notification messages."""
         if self.enabled:
             message.encode(encoding = 'UTF-8', errors = 'strict')
-            self.message += f"{message}\r\n \r\n"
+            with self.lock:
+                self.message += f"{message}\r\n \r\n"
 
     def send_notification(self):
         """Send the notification messages if there are any."""
-        if self.enabled and self.message:
-            msg = f"[3C Cyber Bot-Helper {self.program}]\r\n \r\n" + self.message
-            self.queue.put((msg, []))
-            self.message = ""
+        if self.enabled:
+            with self.lock:
+                message = self.message
+                self.message = ""
+
+            if message:
+                # The header is added by the worker, once per (combined) notification
+                self.queue.put(message)
 
 
 class TimedRotatingFileHandler(_TimedRotatingFileHandler):
@@ -187,6 +206,10 @@ class Logger:
         elif level == "debug":
             self.my_logger.debug(message)
 
+    def is_debug_enabled(self):
+        """Return True when debug messages will be logged."""
+        return self.my_logger.isEnabledFor(logging.DEBUG)
+
     def info(self, message, notify=False):
         """Info level."""
         self.log(message, "info")
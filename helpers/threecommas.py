@@ -1,4 +1,5 @@
 """Cyberjunky's 3Commas bot helpers."""
+from concurrent.futures import ThreadPoolExecutor
 from math import nan
 import os
 from py3cw.request import Py3CW
@@ -8,6 +9,9 @@ from helpers.misc import get_round_digits
 
 from .threecommas_websocket import ThreeCommasWebsocketHandler
 
+# Maximum number of bots for which the marketcode is fetched at the same time
+MAX_CONCURRENT_MARKETCODE_REQUESTS = 8
+
 
 def load_blacklist(logger, api, blacklistfile):
     """Return blacklist data to be used."""
@@ -732,6 +736,36 @@ def threecommas_get_data_for_adding_funds(logger, api, deal):
     return fundsdata
 
 
+def get_threecommas_bot_marketcode(logger, api, botid):
+    """Get the marketcode of the account used by the bot."""
+
+    boterror, botdata = api.request(
+        entity="bots",
+        action="show",
+        action_id=str(botid),
+    )
+
+    if botdata:
+        accountid = botdata["account_id"]
+        marketcode = get_threecommas_account_marketcode(logger, api, accountid)
+
+        logger.info(
+            f"Fetched marketcode '{marketcode}' for "
+            f"bot {botdata['id']} with account id {accountid}."
+        )
+
+        return botdata["id"], marketcode
+
+    if boterror and "msg" in boterror:
+        logger.error(
+            f"Error occurred fetching marketcode data: {boterror['msg']}"
+        )
+    else:
+        logger.error("Error occurred fetching marketcode data")
+
+    return None
+
+
 def prefetch_marketcodes(logger, api, botids):
     """Gather and return marketcodes for all bots."""
 
@@ -741,29 +775,23 @@ def prefetch_marketcodes(logger, api, botids):
         f"Prefetch marketcodes for the following bots: {botids}"
     )
 
-    for botid in botids:
-        if botid and botid not in marketcodearray:
-            boterror, botdata = api.request(
-                entity="bots",
-                action="show",
-                action_id=str(botid),
-            )
-
-            if botdata:
-                accountid = botdata["account_id"]
-                marketcode = get_threecommas_account_marketcode(logger, api, accountid)
-                marketcodearray[botdata["id"]] = marketcode
-
-                logger.info(
-                    f"Fetched marketcode '{marketcode}' for "
-                    f"bot {botdata['id']} with account id {accountid}."
-                )
-            else:
-                if boterror and "msg" in boterror:
-                    logger.error(
-                        f"Error occurred fetching marketcode data: {boterror['msg']}"
-                    )
-                else:
-                    logger.error("Error occurred fetching marketcode data")
+    # Fetch every bot only once. The requests are independent and mostly waiting
+    # on 3Commas, so they are done concurrently
+    uniquebotids = list(dict.fromkeys(botid for botid in botids if botid))
+    if not uniquebotids:
+        return marketcodearray
+
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_CONCURRENT_MARKETCODE_REQUESTS, len(uniquebotids))
+    ) as executor:
+        futures = [
+            executor.submit(get_threecommas_bot_marketcode, logger, api, botid)
+            for botid in uniquebotids
+        ]
+
+        for future in futures:
+            botmarketcode = future.result()
+            if botmarketcode:
+                marketcodearray[botmarketcode[0]] = botmarketcode[1]
 
     return marketcodearray
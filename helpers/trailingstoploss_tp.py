@@ -1,6 +1,7 @@
 """Cyberjunky's 3Commas bot helpers."""
 
 import decimal
+from math import fabs, floor
 from helpers.misc import round_decimals_up
 
 
@@ -16,38 +17,71 @@ def determine_profit_prefix(deal_data):
 def get_profit_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone()
+    return cursor.execute(
+        "SELECT * FROM deal_profit WHERE dealid = ?", (dealid,)
+    ).fetchone()
 
 
 def get_safety_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_safety WHERE dealid = {dealid}").fetchone()
+    return cursor.execute(
+        "SELECT * FROM deal_safety WHERE dealid = ?", (dealid,)
+    ).fetchone()
 
 
-def get_pending_order_db_data(cursor, dealid):
-    """Check if order for deal was logged and get stored data."""
+def get_deals_db_data(cursor, table, dealids):
+    """Get stored data of all the specified deals at once, indexed by dealid."""
 
-    return cursor.execute(f"SELECT * FROM pending_orders WHERE dealid = {dealid}").fetchone()
+    if not dealids:
+        return {}
 
+    placeholders = ", ".join("?" * len(dealids))
+    rows = cursor.execute(
+        f"SELECT * FROM {table} WHERE dealid IN ({placeholders})", dealids
+    ).fetchall()
 
-def check_float(potential_float):
-    """Check if the passed argument is a valid float"""
+    return {row["dealid"]: row for row in rows}
 
-    try:
-        float(potential_float)
-        return True
-    except ValueError:
-        return False
 
+def convert_config_list(config_list):
+    """Convert the values of the profit- or safety-config entries to numbers"""
 
-def is_new_deal(cursor, dealid):
-    """Return True if the deal is not know yet, otherwise False"""
+    convertedlist = []
+    for entry in config_list:
+        convertedentry = {}
+        for key, value in entry.items():
+            if value is None:
+                convertedentry[key] = value
+            elif key in ("activation-so-count", "sl-timeout"):
+                convertedentry[key] = int(value)
+            else:
+                convertedentry[key] = float(value)
+        convertedlist.append(convertedentry)
 
-    if cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone():
-        return False
+    return convertedlist
 
-    return True
+
+def round_percentage(percentage):
+    """Round the percentage (half up) to two decimals"""
+
+    return floor(percentage * 100.0 + 0.5) / 100.0
+
+
+def calculate_total_drop_percentage(deal_data):
+    """Calculate the total % drop of the current price compared to the base order price"""
+
+    return round_percentage(fabs(
+        ((float(deal_data["current_price"]) /
+        float(deal_data["base_order_average_price"])) * 100.0) - 100.0
+    ))
+
+
+def is_safety_trailing_active(deal_db_data):
+    """Return True if trailing towards the next Safety Order has been started"""
+
+    return (deal_db_data["last_profit_percentage"] != 0.0 or
+            deal_db_data["add_funds_percentage"] != deal_db_data["next_so_percentage"])
 
 
 def calculate_slpercentage_base_price_short(sl_price, base_price):
@@ -838,7 +838,11 @@ def cleanup_database():
         f"{unix_timestamp_to_string(cleanuptime, '%Y-%m-%d %H:%M:%S')}."
     )
 
-    pairdata = sharedcursor.execute(
+    # Plain tuples are sufficient here, so skip the sqlite3.Row construction per row
+    cleanupcursor = shareddb.cursor()
+    cleanupcursor.row_factory = None
+
+    pairdata = cleanupcursor.execute(
             f"SELECT base, coin FROM pairs WHERE last_updated < {cleanuptime}"
         ).fetchall()
 
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import argparse
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 import configparser
 import json
 from math import fabs
@@ -12,10 +14,6 @@ import traceback
 from pathlib import Path
 
 from helpers.logging import Logger, NotificationHandler
-from helpers.database import (
-    get_next_process_time,
-    set_next_process_time
-)
 from helpers.misc import (
     get_round_digits,
     unix_timestamp_to_string,
@@ -33,23 +31,107 @@ from helpers.threecommas import (
 from helpers.trailingstoploss_tp import (
     calculate_safety_order,
     calculate_sl_percentage,
+    calculate_total_drop_percentage,
     calculate_tp_percentage,
-    check_float,
+    convert_config_list,
     determine_price_quantity,
     determine_profit_prefix,
-    get_pending_order_db_data,
+    get_deals_db_data,
     get_profit_db_data,
     get_safety_db_data,
-    is_new_deal,
+    is_safety_trailing_active,
     is_valid_deal,
+    round_percentage,
     validate_add_funds_data
 )
 
+# Deal strategies which can be handled
+VALID_STRATEGIES = frozenset(("short", "long"))
+
+# Deal statuses (lowercase) in which the deal can be processed further
+PROCESSABLE_DEAL_STATUSES = frozenset(("bought", "close_strategy_activated"))
+
+# Maximum number of deal updates sent to 3Commas at the same time
+MAX_CONCURRENT_DEAL_UPDATES = 5
+
+# SQL statements executed for every deal. Kept as constants so the same string is
+# passed each time and sqlite3 reuses the prepared statement from its cache
+SQL_INSERT_DEAL_PROFIT = (
+    "INSERT INTO deal_profit ("
+    "dealid, "
+    "botid, "
+    "last_profit_percentage, "
+    "last_readable_sl_percentage, "
+    "last_readable_tp_percentage "
+    ") VALUES (?, ?, ?, ?, ?)"
+)
+SQL_INSERT_DEAL_SAFETY = (
+    "INSERT INTO deal_safety ("
+    "dealid, "
+    "botid, "
+    "last_profit_percentage, "
+    "add_funds_percentage, "
+    "next_so_percentage, "
+    "filled_so_count, "
+    "shift_percentage "
+    ") VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_UPDATE_DEAL_PROFIT = (
+    "UPDATE deal_profit SET "
+    "last_profit_percentage = ?, "
+    "last_readable_sl_percentage = ?, "
+    "last_readable_tp_percentage = ? "
+    "WHERE dealid = ?"
+)
+SQL_UPDATE_SAFETY_ORDER = (
+    "UPDATE deal_safety SET "
+    "next_so_percentage = ?, "
+    "filled_so_count = ?, "
+    "shift_percentage = ? "
+    "WHERE dealid = ?"
+)
+SQL_UPDATE_SAFETY_MONITOR = (
+    "UPDATE deal_safety SET "
+    "last_profit_percentage = ?, "
+    "add_funds_percentage = ? "
+    "WHERE dealid = ?"
+)
+SQL_INSERT_PENDING_ORDER = (
+    "INSERT INTO pending_orders ("
+    "dealid, "
+    "botid, "
+    "order_id, "
+    "cancel_at_percentage, "
+    "number_of_so, "
+    "next_so_percentage, "
+    "shift_percentage "
+    ") VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_UPDATE_PENDING_ORDER = (
+    "UPDATE pending_orders SET "
+    "order_id = ? "
+    "WHERE dealid = ? "
+    "AND order_id = ?"
+)
+SQL_DELETE_PENDING_ORDER = "DELETE FROM pending_orders WHERE dealid = ? AND order_id = ?"
+
+
 def load_config():
     """Create default or load existing config file."""
 
-    cfg = configparser.ConfigParser(strict=False)
+    # Skip parsing the file again when it has not been modified since the last load
+    try:
+        mtime = os.stat(f"{datadir}/{program}.ini").st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime is not None and mtime == configcache["mtime"]:
+        return configcache["config"]
+
+    cfg = configparser.RawConfigParser(strict=False)
     if cfg.read(f"{datadir}/{program}.ini"):
+        configcache["mtime"] = mtime
+        configcache["config"] = cfg
         return cfg
 
     cfg["settings"] = {
@@ -110,10 +192,13 @@ def load_config():
 def upgrade_config(thelogger, cfg):
     """Upgrade config file if needed."""
 
+    cfgfilename = f"{datadir}/{program}.ini"
+    changed = False
+
     if len(cfg.sections()) == 1:
         # Old configuration containing only one section (settings)
         logger.error(
-            f"Upgrading config file '{datadir}/{program}.ini' to support multiple sections"
+            f"Upgrading config file '{cfgfilename}' to support multiple sections"
         )
 
         cfg["tsl_tp_default"] = {
@@ -125,15 +210,12 @@ def upgrade_config(thelogger, cfg):
             "tp-increment-factor": cfg.get("settings", "tp-increment-factor"),
         }
 
-        cfg.remove_option("settings", "botids")
-        cfg.remove_option("settings", "activation-percentage")
-        cfg.remove_option("settings", "initial-stoploss-percentage")
-        cfg.remove_option("settings", "sl-increment-factor")
-        cfg.remove_option("settings", "tp-increment-factor")
-
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
+        for option in ("botids", "activation-percentage", "initial-stoploss-percentage",
+                       "sl-increment-factor", "tp-increment-factor"):
+            if cfg.has_option("settings", option):
+                cfg.remove_option("settings", option)
 
+        changed = True
         thelogger.info("Upgraded the configuration file")
 
     for cfgsection in cfg.sections():
@@ -152,74 +234,73 @@ def upgrade_config(thelogger, cfg):
 
                 cfg.set(cfgsection, "safety-config", json.dumps(cfgsectionsafetyconfig))
 
-                with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                    cfg.write(cfgfile)
-
+                changed = True
                 thelogger.info(
                     f"Upgraded section {cfgsection} to have profit- and safety- config list"
                 )
             else:
+                profitconfiglist = json.loads(cfg.get(cfgsection, "profit-config"))
+
                 jsonconfiglist = list()
-                for configsectionconfig in json.loads(cfg.get(cfgsection, "profit-config")):
-                    if "activation-so-count" not in configsectionconfig:
-                        cfgsectionconfig = {
-                            "activation-percentage": configsectionconfig.get("activation-percentage"),
-                            "activation-so-count": "0",
-                            "initial-stoploss-percentage": configsectionconfig.get("initial-stoploss-percentage"),
-                            "sl-timeout": configsectionconfig.get("sl-timeout"),
-                            "sl-increment-factor": configsectionconfig.get("sl-increment-factor"),
-                            "tp-increment-factor": configsectionconfig.get("tp-increment-factor"),
-                        }
-                        jsonconfiglist.append(cfgsectionconfig)
+                if not all("activation-so-count" in entry for entry in profitconfiglist):
+                    for configsectionconfig in profitconfiglist:
+                        if "activation-so-count" not in configsectionconfig:
+                            cfgsectionconfig = {
+                                "activation-percentage": configsectionconfig.get("activation-percentage"),
+                                "activation-so-count": "0",
+                                "initial-stoploss-percentage": configsectionconfig.get("initial-stoploss-percentage"),
+                                "sl-timeout": configsectionconfig.get("sl-timeout"),
+                                "sl-increment-factor": configsectionconfig.get("sl-increment-factor"),
+                                "tp-increment-factor": configsectionconfig.get("tp-increment-factor"),
+                            }
+                            jsonconfiglist.append(cfgsectionconfig)
 
                 if len(jsonconfiglist) > 0:
                     cfg.set(cfgsection, "config", json.dumps(jsonconfiglist))
 
-                    with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                        cfg.write(cfgfile)
-
+                    changed = True
                     thelogger.info(f"Updates section {cfgsection} to add activation-so-count")
 
             if not cfg.has_option(cfgsection, "safety-mode"):
                 cfg.set(cfgsection, "safety-mode", "merge")
 
-                with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                    cfg.write(cfgfile)
-
+                changed = True
                 thelogger.info(f"Updates section {cfgsection} to add safety-mode")
 
     if not cfg.has_option("settings", "notify-trailing-update"):
         cfg.set("settings", "notify-trailing-update", "True")
         cfg.set("settings", "notify-trailing-reset", "True")
 
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
-
+        changed = True
         thelogger.info("Updates settings to add notify options")
 
     if not cfg.has_option("settings", "notify-trailing-start"):
         cfg.set("settings", "notify-trailing-start", "True")
 
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
-
+        changed = True
         thelogger.info("Updates settings to add notify options")
 
     if not cfg.has_option("settings", "3c-apikey-path"):
         cfg.set("settings", "3c-apikey-path", "")
 
-        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
-            cfg.write(cfgfile)
+        changed = True
+        thelogger.info("Upgraded the configuration file (3c-apikey-path)")
 
-        logger.info("Upgraded the configuration file (3c-apikey-path)")
+    # Write all upgrades to the file at once
+    if changed:
+        with open(cfgfilename, "w", encoding = "utf-8") as cfgfile:
+            cfg.write(cfgfile)
 
     return cfg
 
 
 def update_deal_profit(bot_data, deal_data, new_stoploss, new_take_profit, sl_timeout):
-    """Update bot with new SL and TP."""
+    """Update bot with new SL and TP. Returns the update status and error message, if any."""
 
     dealupdated = False
+    errormessage = ""
+
+    dealid = str(deal_data["id"])
 
     payload = {
         "deal_id": bot_data["id"],
@@ -237,7 +318,7 @@ def update_deal_profit(bot_data, deal_data, new_stoploss, new_take_profit, sl_ti
     #else:
     #    payload["take_profit"] = 0.05
     #    payload["trailing_enabled"] = False
-    if len(deal_data["close_strategy_list"]) == 0:
+    if not deal_data["close_strategy_list"]:
         payload["take_profit"] = new_take_profit
 
     payload["trailing_enabled"] = deal_data["trailing_enabled"]
@@ -246,7 +327,7 @@ def update_deal_profit(bot_data, deal_data, new_stoploss, new_take_profit, sl_ti
     error, data = api.request(
         entity="deals",
         action="update_deal",
-        action_id=str(deal_data["id"]),
+        action_id=dealid,
         payload=payload
     )
 
@@ -255,30 +336,80 @@ def update_deal_profit(bot_data, deal_data, new_stoploss, new_take_profit, sl_ti
             float(data["take_profit"]) != new_take_profit or
             int(data["stop_loss_timeout_in_seconds"]) != sl_timeout
         ):
-            logger.error(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+            errormessage = (
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{dealid}: "
                 f"update of Stoploss, Stoploss timeout or Take Profit failed!"
             )
         else:
             dealupdated = True
-            logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"changed SL from {deal_data['stop_loss_percentage']}% "
-                f"to {data['stop_loss_percentage']}%. "
-                f"Changed TP from {deal_data['take_profit']}% "
-                f"to {data['take_profit']}%. "
-                f"Changed SL timeout from {deal_data['stop_loss_timeout_in_seconds']}s "
-                f"to {data['stop_loss_timeout_in_seconds']}s."
-            )
+            if logger.is_debug_enabled():
+                logger.debug(
+                    f"\"{bot_data['name']}\": {deal_data['pair']}/{dealid}: "
+                    f"changed SL from {deal_data['stop_loss_percentage']}% "
+                    f"to {data['stop_loss_percentage']}%. "
+                    f"Changed TP from {deal_data['take_profit']}% "
+                    f"to {data['take_profit']}%. "
+                    f"Changed SL timeout from {deal_data['stop_loss_timeout_in_seconds']}s "
+                    f"to {data['stop_loss_timeout_in_seconds']}s."
+                )
     else:
         if error and "msg" in error:
-            logger.error(
-                f"Error occurred updating deal with new SL/TP values: {error['msg']}"
-            )
+            errormessage = f"Error occurred updating deal with new SL/TP values: {error['msg']}"
         else:
-            logger.error("Error occurred updating deal with new SL/TP valuess")
+            errormessage = "Error occurred updating deal with new SL/TP valuess"
+
+    return dealupdated, errormessage
+
+
+def get_section_config(cfg, section, option):
+    """Get the parsed config list of the section."""
+
+    # Sort the entries on activation percentage, so the matching entry can be
+    # looked up using a binary search on the activation percentages
+    configlist = sorted(
+        convert_config_list(json.loads(cfg.get(section, option))),
+        key=lambda entry: entry["activation-percentage"]
+    )
+    activationpercentages = tuple(entry["activation-percentage"] for entry in configlist)
+    sectionconfig = {
+        "entries": configlist,
+        "activation-percentages": activationpercentages,
+        "min-activation": activationpercentages[0] if activationpercentages else None,
+    }
+    return sectionconfig
+
+
+def build_bot_plan(cfg):
+    """Build the list of sections with their parsed config, used until the config changes."""
+
+    botplan = []
+    for section in cfg.sections():
+        if section.startswith("tsl_tp_"):
+            safetymode = cfg.get(section, "safety-mode")
+
+            #TODO: add the 'shift' option in the future
+            if safetymode.lower() not in ("merge"):
+                logger.warning(
+                    f"Section {section} has an invalid \'safety-mode\'. Skipping this section!"
+                )
+                continue
+
+            botplan.append(
+                {
+                    "section": section,
+                    "botids": json.loads(cfg.get(section, "botids")),
+                    "profit-config": get_section_config(cfg, section, "profit-config"),
+                    "safety-config": get_section_config(cfg, section, "safety-config"),
+                    "safety-mode": safetymode,
+                }
+            )
+        elif section not in ("settings"):
+            logger.warning(
+                f"Section '{section}' not processed (prefix 'tsl_tp_' missing)!",
+                False
+            )
 
-    return dealupdated
+    return botplan
 
 
 def get_settings(section_config: dict, current_profit: float, current_so_level: int) -> dict:
@@ -286,21 +417,29 @@ def get_settings(section_config: dict, current_profit: float, current_so_level:
         Get the settings from the config corresponding to the current profit
         and current so level.
 
-        @param section_config: The config section to check
+        @param section_config: The cached config section to check, with the entries
+                               sorted on activation percentage
         @param current_profit: The profit percentage of the current deal
         @param current_so_level: The filled safety order count of the current deal
 
         @return: The last matching config entry if there are multiple matches or an empty dict
     """
 
-    settings = {}
+    # Nothing can match when the profit is below the lowest activation percentage
+    minactivation = section_config["min-activation"]
+    if minactivation is None or current_profit < minactivation:
+        return {}
+
+    entries = section_config["entries"]
 
-    for entry in section_config:
-        if (current_profit >= float(entry["activation-percentage"]) and
-            current_so_level >= int(entry["activation-so-count"])):
-            settings = entry
+    # Walk back from the last entry which is activated by the current profit
+    index = bisect_right(section_config["activation-percentages"], current_profit) - 1
+    while index >= 0:
+        if current_so_level >= entries[index]["activation-so-count"]:
+            return entries[index]
+        index -= 1
 
-    return settings
+    return {}
 
 
 def process_deals(bot_data, section_profit_config, section_safety_config, section_safety_mode):
@@ -319,11 +458,24 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
 
         return 0
 
-    currentdeals = []
+    currentdeals = set()
+
+    # Invariant for all deals of this bot
+    hasprofitconfig = len(section_profit_config["entries"]) > 0
+    hassafetyconfig = len(section_safety_config["entries"]) > 0
+
+    # Fetch the stored data of all deals at once, instead of querying per deal
+    dealids = [deal["id"] for deal in deals]
+    profitdbdata = get_deals_db_data(readonlycursor, "deal_profit", dealids)
+    safetydbdata = get_deals_db_data(readonlycursor, "deal_safety", dealids)
+    orderdbdata = get_deals_db_data(readonlycursor, "pending_orders", dealids)
+
+    # SL/TP updates for 3Commas, collected so they can be sent concurrently
+    profitupdates = []
 
     for deal in deals:
         # Check whether we can handle the deal based on the strategy
-        if deal["strategy"] not in ("short", "long"):
+        if deal["strategy"] not in VALID_STRATEGIES:
             logger.warning(
                 f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']}: "
                 f"Unknown strategy {deal['strategy']}!"
@@ -332,7 +484,9 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
 
         # Check whether the actual_profit_percentage can be obtained from the deal.
         # Pairs which are removed from the exchange, leave a deal without percentage.
-        if not check_float(deal["actual_profit_percentage"]):
+        try:
+            profitpercentage = float(deal["actual_profit_percentage"])
+        except (TypeError, ValueError):
             logger.warning(
                 f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} does no longer "
                 f"exist on the exchange! Cancel or handle deal manually on 3Commas!"
@@ -344,36 +498,47 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
         # cancelled, completed and panic_sell_pending are states in which we
         # don't need to do anything or should not interfere with.
         #if deal["status"].lower() not in("bought", "close_strategy_activated"):
-        if deal["status"].lower() not in("bought", "close_strategy_activated"):
+        status = deal["status"]
+        if status.lower() not in PROCESSABLE_DEAL_STATUSES:
             logger.info(
                 f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} has status "
-                f"'{deal['status']}' which is not valid for further processing!"
+                f"'{status}' which is not valid for further processing!"
             )
             continue
 
         processdeal = True
-        if is_new_deal(cursor, deal["id"]):
-            if is_valid_deal(logger, bot_data, deal, section_safety_config):
+        if deal["id"] not in profitdbdata:
+            if is_valid_deal(logger, bot_data, deal, section_safety_config["entries"]):
                 add_deal_in_db(deal["id"], botid)
 
                 # Calculate the percentage for the first Safety Order
                 set_first_safety_order(bot_data, deal, 0, 0.0)
+
+                # Fetch the just stored data for further processing
+                profitdbdata[deal["id"]] = get_profit_db_data(cursor, deal["id"])
+                safetydbdata[deal["id"]] = get_safety_db_data(cursor, deal["id"])
             else:
                 # No valid deal (yet), so don't process it for now
                 processdeal = False
 
         if processdeal:
-            currentdeals.append(deal["id"])
+            currentdeals.add(deal["id"])
 
-            if float(deal["actual_profit_percentage"]) > 0.0 and len(section_profit_config) > 0:
+            if profitpercentage > 0.0 and hasprofitconfig:
                 monitoreddeals += process_deal_for_profit(
-                    section_profit_config, bot_data, deal
+                    section_profit_config, bot_data, deal, profitdbdata[deal["id"]],
+                    bool(deal["close_strategy_list"]), profitupdates
                 )
-            elif float(deal["actual_profit_percentage"]) < 0.0 and len(section_safety_config) > 0:
+            elif profitpercentage < 0.0 and hassafetyconfig:
                 monitoreddeals += process_deal_for_safety_order(
-                    section_safety_config, section_safety_mode, bot_data, deal
+                    section_safety_config, section_safety_mode, bot_data, deal,
+                    safetydbdata.get(deal["id"]), orderdbdata.get(deal["id"]),
+                    calculate_total_drop_percentage(deal)
                 )
 
+    # Send the collected SL/TP updates and process the results
+    apply_deal_profit_updates(profitupdates)
+
     # Housekeeping, clean things up and prevent endless growing database
     remove_closed_deals(botid, currentdeals)
 
@@ -385,11 +550,12 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
     return monitoreddeals
 
 
-def process_deal_for_profit(section_profit_config, bot_data, deal_data):
+def process_deal_for_profit(section_profit_config, bot_data, deal_data, deal_db_data,
+                            has_close_strategy, profit_updates):
     """Process a deal which has positive profit"""
 
     # Don't process the deal further when the current profit exceeds the configured TP
-    if (len(deal_data["close_strategy_list"]) == 0 and
+    if (not has_close_strategy and
         float(deal_data["actual_profit_percentage"]) >= float(deal_data["take_profit"])
     ):
         logger.debug(
@@ -403,8 +569,6 @@ def process_deal_for_profit(section_profit_config, bot_data, deal_data):
     requiremonitoring = 0
 
     # Deal is in positive profit, so TSL mode which requires the profit-config
-    dealdbdata = get_profit_db_data(cursor, deal_data["id"])
-
     profitconfig = get_settings(
         section_profit_config,
         float(deal_data["actual_profit_percentage"]),
@@ -412,29 +576,24 @@ def process_deal_for_profit(section_profit_config, bot_data, deal_data):
     )
 
     requiremonitoring = handle_deal_profit(
-            bot_data, deal_data, dealdbdata, profitconfig
+            bot_data, deal_data, deal_db_data, profitconfig, has_close_strategy, profit_updates
         )
 
     return requiremonitoring
 
 
-def process_deal_for_safety_order(section_safety_config, section_safety_mode, bot_data, deal_data):
+def process_deal_for_safety_order(section_safety_config, section_safety_mode, bot_data, deal_data,
+                                  deal_db_data, order_db_data, total_profit):
     """Process a deal which has negative profit"""
 
-    # SO mode requires the total % drop without filled safety oders
-    totalprofit = round(fabs(
-        ((float(deal_data["current_price"]) /
-        float(deal_data["base_order_average_price"])) * 100.0) - 100.0
-    ), 2)
-
-    # Fetch data from local DB for this deal
-    dealdbdata = get_safety_db_data(cursor, deal_data["id"])
-    orderdbdata = get_pending_order_db_data(cursor, deal_data["id"])
+    # SO mode requires the total % drop without filled safety oders (total_profit)
+    totalprofit = total_profit
+    dealdbdata = deal_db_data
 
     # Evaluate returns two values:
     # 0: True if the deal requires monitoring, in which case this function can return directly
     # 1: True if the DB data has been changed, and the local data must be updated
-    result = evaluate_deal_orders(bot_data, deal_data, dealdbdata, orderdbdata, totalprofit)
+    result = evaluate_deal_orders(bot_data, deal_data, dealdbdata, order_db_data, totalprofit)
     if result[0]:
         return 1
     if result[1]:
@@ -451,7 +610,7 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
     requiremonitoring = 0
 
     # We use the relative profit to the next SO for determining if further processing is required
-    sorelativeprofit = round(totalprofit - dealdbdata["next_so_percentage"], 2)
+    sorelativeprofit = round_percentage(totalprofit - dealdbdata["next_so_percentage"])
     if sorelativeprofit >= 0.0:
         safetyconfig = get_settings(
                 section_safety_config, sorelativeprofit, dealdbdata["filled_so_count"]
@@ -468,9 +627,7 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
                 f"and {dealdbdata['filled_so_count']} filled SO."
             )
 
-            if (dealdbdata["last_profit_percentage"] != 0.0 or
-                dealdbdata["add_funds_percentage"] != dealdbdata["next_so_percentage"]
-            ):
+            if is_safety_trailing_active(dealdbdata):
                 logger.info(
                     f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
                     f"trailing reset because current profit suddenly changed above "
@@ -487,9 +644,7 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
             f"at {dealdbdata['next_so_percentage']:0.2f}% will be reached."
         )
 
-        if (dealdbdata["last_profit_percentage"] != 0.0 or
-            dealdbdata["add_funds_percentage"] != dealdbdata["next_so_percentage"]
-        ):
+        if is_safety_trailing_active(dealdbdata):
             logger.info(
                 f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
                 f"trailing reset because profit suddenly changed and went above "
@@ -501,8 +656,14 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
     return requiremonitoring
 
 
-def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
-    """Update deal (short or long) and increase SL (Trailing SL) when profit has increased."""
+def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config, has_close_strategy,
+                       profit_updates):
+    """
+        Update deal (short or long) and increase SL (Trailing SL) when profit has increased.
+
+        Updates for 3Commas are added to profit_updates and must be applied by the caller
+        using apply_deal_profit_updates.
+    """
 
     requiremonitoring = 0
 
@@ -511,13 +672,14 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
     lastreadableslpercentage = float(deal_db_data["last_readable_sl_percentage"])
 
     if profit_config and currentprofitpercentage > lastprofitpercentage:
-        message = (
+        # Parts of the message, joined only once when the message is complete
+        messageparts = [
             f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
             f"profit increased from {lastprofitpercentage}% to {currentprofitpercentage}%. "
-        )
+        ]
 
         activationdiff = (
-            currentprofitpercentage - float(profit_config.get("activation-percentage"))
+            currentprofitpercentage - profit_config["activation-percentage"]
         )
 
         # SL data contains three values:
@@ -535,10 +697,10 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
 
         sendnotification = notifytrailingupdate
 
-        newsltimeout = int(profit_config.get("sl-timeout"))
+        newsltimeout = profit_config["sl-timeout"]
         if (fabs(sldata[1]) > 0.0 and sldata[1] != sldata[0]):
             if lastreadableslpercentage != sldata[2]:
-                message += (
+                messageparts.append(
                     f"StopLoss increased from {lastreadableslpercentage}% "
                     f"to {sldata[2]}%. "
                 )
@@ -546,14 +708,14 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
             # Check whether there is an old timeout, and log when the new time out is different
             currentsltimeout = deal_data["stop_loss_timeout_in_seconds"]
             if currentsltimeout is not None and currentsltimeout != newsltimeout:
-                message += (
+                messageparts.append(
                     f"StopLoss timeout changed from {currentsltimeout}s "
                     f"to {newsltimeout}s. "
                 )
 
         if tpdata[1] > tpdata[0]:
-            sendnotification = (lastprofitpercentage == 0.0 and notifytrailingstart) or notifytrailingupdate
-            message += (
+            sendnotification = (lastprofitpercentage == 0.0 and notifytrailingstart) or sendnotification
+            messageparts.append(
                 f"TakeProfit increased from {tpdata[0]}% "
                 f"to {tpdata[1]}%. "
             )
@@ -571,24 +733,12 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
             # Fake request to log all the orders of the deal
             get_threecommas_deal_order_status(logger, api, deal_data["pair"], deal_data["id"], "*")
 
-        dealupdated = False
-        if len(deal_data["close_strategy_list"]) > 0:
+        message = "".join(messageparts)
+
+        if has_close_strategy:
             # Deal is using a close strategy and the 3C API is broken (feb 2023). The base
             # cannot be changed somehow, support is notified and no solution yet. So, to
             # work around this we keep track of the stoploss within this script
-            dealupdated = True
-        elif update_deal_profit(
-            bot_data, deal_data, sldata[1], tpdata[1], newsltimeout
-        ):
-            # Regular deal with fixed TP, and SL/TP values have been updated
-            dealupdated = True
-        else:
-            logger.error(
-                f"Update failed for message: {message}"
-            )
-
-        if dealupdated:
-            # Update local administration
             update_profit_in_db(
                 deal_data['id'], currentprofitpercentage,
                 sldata[2], tpdata[1]
@@ -596,13 +746,26 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
 
             # Send the message to the user
             logger.info(message, sendnotification)
+        else:
+            # Regular deal with fixed TP, update SL/TP values at 3Commas
+            profit_updates.append({
+                "bot_data": bot_data,
+                "deal_data": deal_data,
+                "stoploss": sldata[1],
+                "takeprofit": tpdata[1],
+                "sltimeout": newsltimeout,
+                "dbvalues": (currentprofitpercentage, sldata[2], tpdata[1]),
+                "message": message,
+                "notify": sendnotification,
+                "logfailure": True,
+            })
 
         # SL and/or TP calculated, so deal must be monitored for any changes
         requiremonitoring = 1
     else:
         # Profit has not increased. Check if the stoploss has been triggered
         # for deals with a close condition
-        if len(deal_data["close_strategy_list"]) > 0:
+        if has_close_strategy:
             evaluate_mp_stoploss(
                 bot_data, deal_data, currentprofitpercentage, lastreadableslpercentage
             )
@@ -611,16 +774,21 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
         ):
             # No valid profit_config, so the profit has dropped. Trailing was activated before,
             # so restore TP and SL to their original values
-            if update_deal_profit(bot_data, deal_data, 0.0, float(bot_data["take_profit"]), 0):
-                update_profit_in_db(
-                    deal_data['id'], 0.0, 0.0, 0.0
-                )
-                logger.info(
+            profit_updates.append({
+                "bot_data": bot_data,
+                "deal_data": deal_data,
+                "stoploss": 0.0,
+                "takeprofit": float(bot_data["take_profit"]),
+                "sltimeout": 0,
+                "dbvalues": (0.0, 0.0, 0.0),
+                "message": (
                     f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
                     f"profit has decreased below configured profit-config. Trailing "
-                    f"has been reset and TP restored to {bot_data['take_profit']}%.",
-                    notifytrailingreset
-                )
+                    f"has been reset and TP restored to {bot_data['take_profit']}%."
+                ),
+                "notify": notifytrailingreset,
+                "logfailure": False,
+            })
         else:
             logger.debug(
                 f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
@@ -636,6 +804,39 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
     return requiremonitoring
 
 
+def apply_deal_profit_updates(profit_updates):
+    """Send the SL/TP updates to 3Commas concurrently and store the successful ones."""
+
+    if not profit_updates:
+        return
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DEAL_UPDATES) as executor:
+        results = list(executor.map(
+            lambda update: update_deal_profit(
+                update["bot_data"], update["deal_data"], update["stoploss"],
+                update["takeprofit"], update["sltimeout"]
+            ),
+            profit_updates
+        ))
+
+    # Database and notifications are handled from this thread only
+    profitrows = []
+    for update, (dealupdated, errormessage) in zip(profit_updates, results):
+        if errormessage:
+            logger.error(errormessage)
+
+        if dealupdated:
+            profitrows.append((*update["dbvalues"], update["deal_data"]["id"]))
+
+            # Send the message to the user
+            logger.info(update["message"], update["notify"])
+        elif update["logfailure"]:
+            logger.error(f"Update failed for message: {update['message']}")
+
+    # Update local administration for all updated deals at once
+    update_profits_in_db(profitrows)
+
+
 def evaluate_mp_stoploss(bot_data, deal_data, current_profit_percentage, last_readable_sl_percentage):
     """Evaluate the stoploss for deals with conditional close"""
 
@@ -773,27 +974,26 @@ def evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, total
 
 
 def remove_closed_deals(bot_id, current_deals):
-    """Remove all deals for the given bot, except the ones in the list."""
+    """Remove all deals for the given bot, except the ones in the set."""
 
     if current_deals:
-        # Remove start and end square bracket so we can properly use it
-        current_deals_str = str(current_deals)[1:-1]
-
-        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals_str}")
-        db.execute(
-            f"DELETE FROM deal_profit WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM deal_safety WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM pending_orders WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
+        storeddeals = {
+            row[0] for row in db.execute(
+                "SELECT dealid FROM deal_profit WHERE botid = ? "
+                "UNION SELECT dealid FROM deal_safety WHERE botid = ? "
+                "UNION SELECT dealid FROM pending_orders WHERE botid = ?",
+                (bot_id, bot_id, bot_id)
+            ).fetchall()
+        }
 
-        db.commit()
+        closeddeals = [(dealid,) for dealid in storeddeals - current_deals]
+        if closeddeals:
+            logger.debug(
+                f"Deleting old deals from bot {bot_id}: {[deal[0] for deal in closeddeals]}"
+            )
+            db.executemany("DELETE FROM deal_profit WHERE dealid = ?", closeddeals)
+            db.executemany("DELETE FROM deal_safety WHERE dealid = ?", closeddeals)
+            db.executemany("DELETE FROM pending_orders WHERE dealid = ?", closeddeals)
 
 
 def remove_all_deals(bot_id):
@@ -803,34 +1003,28 @@ def remove_all_deals(bot_id):
         f"Removing all stored deals for bot {bot_id}."
     )
 
-    db.execute(
-        f"DELETE FROM deal_profit WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM deal_safety WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM pending_orders WHERE botid = {bot_id}"
-    )
+    db.execute("DELETE FROM deal_profit WHERE botid = ?", (bot_id,))
+    db.execute("DELETE FROM deal_safety WHERE botid = ?", (bot_id,))
+    db.execute("DELETE FROM pending_orders WHERE botid = ?", (bot_id,))
 
-    db.commit()
 
+def load_bot_next_process_times():
+    """Load the next processing time of all bots from the database."""
 
-def get_bot_next_process_time(bot_id):
-    """Get the next processing time for the specified bot."""
+    return {
+        row["botid"]: row["next_processing_timestamp"]
+        for row in readonlycursor.execute(
+            "SELECT botid, next_processing_timestamp FROM bots"
+        ).fetchall()
+    }
 
-    dbrow = cursor.execute(
-            f"SELECT next_processing_timestamp FROM bots WHERE botid = {bot_id}"
-        ).fetchone()
 
-    nexttime = int(time.time())
-    if dbrow is not None:
-        nexttime = dbrow["next_processing_timestamp"]
-    else:
-        # Record missing, create one
-        set_bot_next_process_time(bot_id, nexttime)
+def get_bot_next_process_time(bot_id):
+    """Get the next processing time for the specified bot."""
 
-    return nexttime
+    # Bots without a stored time are processed directly, the time is stored afterwards.
+    # Subtract one second to allow direct processing
+    return botnextprocesstimes.get(bot_id, int(time.time() - 1.0))
 
 
 def set_bot_next_process_time(bot_id, new_time):
@@ -841,154 +1035,125 @@ def set_bot_next_process_time(bot_id, new_time):
         f"{unix_timestamp_to_string(new_time, '%Y-%m-%d %H:%M:%S')}."
     )
 
+    botnextprocesstimes[bot_id] = new_time
+
     db.execute(
-        f"REPLACE INTO bots (botid, next_processing_timestamp) "
-        f"VALUES ({bot_id}, {new_time})"
+        "REPLACE INTO bots (botid, next_processing_timestamp) VALUES (?, ?)",
+        (bot_id, new_time)
     )
 
-    db.commit()
-
 
 def add_deal_in_db(deal_id, bot_id):
     """Add default data for deal (short or long) to database."""
 
     db.execute(
-        f"INSERT INTO deal_profit ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"last_readable_sl_percentage, "
-        f"last_readable_tp_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}"
-        f")"
+        SQL_INSERT_DEAL_PROFIT,
+        (deal_id, bot_id, 0.0, 0.0, 0.0)
     )
     db.execute(
-        f"INSERT INTO deal_safety ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"add_funds_percentage, "
-        f"next_so_percentage, "
-        f"filled_so_count, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}, {0}, {0.0}"
-        f")"
+        SQL_INSERT_DEAL_SAFETY,
+        (deal_id, bot_id, 0.0, 0.0, 0.0, 0, 0.0)
     )
 
     logger.debug(
         f"Added deal {deal_id} on bot {bot_id} as new deal to db."
     )
 
-    db.commit()
-
 
 def update_profit_in_db(deal_id, tp_percentage, readable_sl_percentage, readable_tp_percentage):
     """Update deal profit related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_profit SET "
-        f"last_profit_percentage = {tp_percentage}, "
-        f"last_readable_sl_percentage = {readable_sl_percentage}, "
-        f"last_readable_tp_percentage = {readable_tp_percentage} "
-        f"WHERE dealid = {deal_id}"
+        SQL_UPDATE_DEAL_PROFIT,
+        (tp_percentage, readable_sl_percentage, readable_tp_percentage, deal_id)
     )
 
-    db.commit()
+
+def update_profits_in_db(profit_rows):
+    """Update deal profit related fields of multiple deals in database."""
+
+    # Each row contains: tp_percentage, readable_sl_percentage, readable_tp_percentage, deal_id
+    db.executemany(SQL_UPDATE_DEAL_PROFIT, profit_rows)
 
 
 def update_safetyorder_in_db(deal_id, filled_so_count, next_so_percentage, shift_percentage):
     """Update deal safety related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"next_so_percentage = {next_so_percentage}, "
-        f"filled_so_count = {filled_so_count}, "
-        f"shift_percentage = {shift_percentage} "
-        f"WHERE dealid = {deal_id}"
+        SQL_UPDATE_SAFETY_ORDER,
+        (next_so_percentage, filled_so_count, shift_percentage, deal_id)
     )
 
-    db.commit()
-
 
 def update_safetyorder_monitor_in_db(deal_id, last_profit_percentage, add_funds_percentage):
     """Update deal safety monitor fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"last_profit_percentage = {last_profit_percentage}, "
-        f"add_funds_percentage = {add_funds_percentage} "
-        f"WHERE dealid = {deal_id}"
+        SQL_UPDATE_SAFETY_MONITOR,
+        (last_profit_percentage, add_funds_percentage, deal_id)
     )
 
-    db.commit()
-
 
 def add_pending_order_in_db(deal_id, bot_id, active_order_id, cancel_at_percentage, number_of_so, next_so_percentage, shift_percentage):
     """Add deal safety order (short or long) in database."""
 
     db.execute(
-        f"INSERT INTO pending_orders ("
-        f"dealid, "
-        f"botid, "
-        f"order_id, "
-        f"cancel_at_percentage, "
-        f"number_of_so, "
-        f"next_so_percentage, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, '{active_order_id}', {cancel_at_percentage}, {number_of_so}, {next_so_percentage}, {shift_percentage}"
-        f")"
+        SQL_INSERT_PENDING_ORDER,
+        (
+            deal_id, bot_id, str(active_order_id), cancel_at_percentage,
+            number_of_so, next_so_percentage, shift_percentage
+        )
     )
 
-    db.commit()
-
 
 def update_pending_order_in_db(deal_id, old_order_id, new_order_id):
     """Update the id of the current open active order"""
 
     db.execute(
-        f"UPDATE pending_orders SET "
-        f"order_id = '{new_order_id}' "
-        f"WHERE dealid = {deal_id} "
-        f"AND order_id = '{old_order_id}'"
+        SQL_UPDATE_PENDING_ORDER,
+        (str(new_order_id), deal_id, str(old_order_id))
     )
 
-    db.commit()
-
 
 def remove_pending_order_from_db(deal_id, order_id):
     """Remove deal safety order (short or long) from database."""
 
     db.execute(
-        f"DELETE FROM pending_orders WHERE dealid = {deal_id} "
-        f"AND order_id = '{order_id}'"
+        SQL_DELETE_PENDING_ORDER,
+        (deal_id, str(order_id))
     )
 
-    db.commit()
-
 
 def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current_profit_percentage):
     """Handle the Safety Orders for this deal."""
 
+    currentaddfundspercentage = deal_db_data["add_funds_percentage"]
+    lastprofitpercentage = deal_db_data["last_profit_percentage"]
+
+    # Profit unchanged and Add Funds threshold not reached; nothing to do except
+    # to keep monitoring the deal (both values are rounded to two decimals)
+    if (current_profit_percentage == lastprofitpercentage and
+        current_profit_percentage > currentaddfundspercentage
+    ):
+        return 1
+
     requiremonitoring = 0
 
     profitprefix = determine_profit_prefix(deal_data)
 
-    currentaddfundspercentage = deal_db_data["add_funds_percentage"]
-    lastprofitpercentage = deal_db_data["last_profit_percentage"]
     if current_profit_percentage > lastprofitpercentage:
-        initialbuy = float(safety_config.get("initial-buy-percentage"))
-
-        newaddfundspercentage = deal_db_data["next_so_percentage"] + initialbuy
+        # Config values are converted once per config load, see build_bot_plan()
+        newaddfundspercentage = (
+            deal_db_data["next_so_percentage"] + safety_config["initial-buy-percentage"]
+        )
         newaddfundspercentage += round(
             (current_profit_percentage - newaddfundspercentage) *
-            float(safety_config.get("buy-increment-factor")),
+            safety_config["buy-increment-factor"],
             2
         )
 
-        if fabs(newaddfundspercentage) > fabs(currentaddfundspercentage):
+        # Both percentages are derived from the absolute drop, so never negative
+        if newaddfundspercentage > currentaddfundspercentage:
             sendnotification = (lastprofitpercentage == 0.0 and notifytrailingstart) or notifytrailingupdate
 
             # Update data in database
@@ -1012,11 +1177,12 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
         requiremonitoring = 1
     elif current_profit_percentage <= currentaddfundspercentage:
         # Current profit passed or equal to buy percentage. Add funds to the deal
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"profit {profitprefix}{current_profit_percentage:0.2f}% "
-            f"passed Add Funds threshold of {profitprefix}{currentaddfundspercentage}%."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                f"profit {profitprefix}{current_profit_percentage:0.2f}% "
+                f"passed Add Funds threshold of {profitprefix}{currentaddfundspercentage}%."
+            )
 
         # When current profit is below the desired Safety Order, reset and start from the beginning
         if current_profit_percentage < deal_db_data["next_so_percentage"]:
@@ -1043,10 +1209,12 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
                 deal_db_data["filled_so_count"], current_profit_percentage
             )
 
-            logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"complete deal data is {deal_data}."
-            )
+            # Formatting the complete deal is expensive, only do so when it is logged
+            if logger.is_debug_enabled():
+                logger.debug(
+                    f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                    f"complete deal data is {deal_data}."
+                )
 
             limitdata = threecommas_get_data_for_adding_funds(logger, api, deal_data)
             if limitdata:
@@ -1119,14 +1287,15 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
         # Buy percentage has not changed, but monitor frequently for changes
         requiremonitoring = 1
 
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"no profit decrease "
-            f"(current: {profitprefix}{current_profit_percentage}%, "
-            f"previous: {profitprefix}{lastprofitpercentage}%, "
-            f"Add Funds threshold: {profitprefix}{currentaddfundspercentage}%). "
-            f"Keep on monitoring."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                f"no profit decrease "
+                f"(current: {profitprefix}{current_profit_percentage}%, "
+                f"previous: {profitprefix}{lastprofitpercentage}%, "
+                f"Add Funds threshold: {profitprefix}{currentaddfundspercentage}%). "
+                f"Keep on monitoring."
+            )
 
     return requiremonitoring
 
@@ -1158,33 +1327,38 @@ def set_first_safety_order(bot_data, deal_data, filled_so_count, current_profit_
 
 
 def open_tsl_db():
-    """Create or open database to store bot and deals data."""
+    """Create or open database to store bot and deals data.
+
+    The helpers writing to this database do not commit; the main loop commits
+    the changes once per bot.
+    """
 
     try:
         dbname = f"{program}.sqlite3"
         dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
+        dbconnection = sqlite3.connect(
+            dbpath, uri=True, isolation_level="IMMEDIATE", cached_statements=256
+        )
         dbconnection.row_factory = sqlite3.Row
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
+        dbconnection = sqlite3.connect(
+            f"{datadir}/{dbname}", isolation_level="IMMEDIATE", cached_statements=256
+        )
         dbconnection.row_factory = sqlite3.Row
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
-        dbcursor.execute(
+        dbcursor.executescript(
             "CREATE TABLE IF NOT EXISTS deal_profit ("
             "dealid INT Primary Key, "
             "botid INT, "
             "last_profit_percentage FLOAT, "
             "last_readable_sl_percentage FLOAT, "
             "last_readable_tp_percentage FLOAT"
-            ")"
-        )
-
-        dbcursor.execute(
+            ");"
             "CREATE TABLE IF NOT EXISTS deal_safety ("
             "dealid INT Primary Key, "
             "botid INT, "
@@ -1193,10 +1367,7 @@ def open_tsl_db():
             "next_so_percentage FLOAT, "
             "filled_so_count INT, "
             "shift_percentage FLOAT "
-            ")"
-        )
-
-        dbcursor.execute(
+            ");"
             "CREATE TABLE IF NOT EXISTS pending_orders ("
             "dealid INT Primary Key, "
             "botid INT, "
@@ -1205,18 +1376,33 @@ def open_tsl_db():
             "number_of_so INT, "
             "next_so_percentage FLOAT, "
             "shift_percentage FLOAT "
-            ")"
-        )
-
-        dbcursor.execute(
+            ");"
             "CREATE TABLE IF NOT EXISTS bots ("
             "botid INT Primary Key, "
             "next_processing_timestamp INT"
-            ")"
+            ");"
         )
 
         logger.info("Database tables created successfully")
 
+    # Use write-ahead logging, which requires less syncing to disk on commit. Only
+    # journal_mode is stored in the database, the others must be set per connection
+    dbconnection.execute("PRAGMA journal_mode = WAL")
+    dbconnection.execute("PRAGMA synchronous = NORMAL")
+    dbconnection.execute("PRAGMA temp_store = MEMORY")
+    dbconnection.execute("PRAGMA cache_size = -20000")
+    dbconnection.execute("PRAGMA busy_timeout = 5000")
+
+    return dbconnection
+
+
+def open_tsl_db_readonly():
+    """Open a read-only connection to the database, next to the connection for writing."""
+
+    dbname = f"{program}.sqlite3"
+    dbconnection = sqlite3.connect(f"file:{datadir}/{dbname}?mode=ro", uri=True)
+    dbconnection.row_factory = sqlite3.Row
+
     return dbconnection
 
 
@@ -1231,14 +1417,13 @@ def upgrade_trailingstoploss_tp_db():
         except sqlite3.OperationalError:
             logger.debug("Older SQLite version; not used column not removed")
 
-        cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_sl_percentage FLOAT DEFAULT 0.0")
-        cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_tp_percentage FLOAT DEFAULT 0.0")
-
-        cursor.execute(
+        cursor.executescript(
+            "ALTER TABLE deals ADD COLUMN last_readable_sl_percentage FLOAT DEFAULT 0.0;"
+            "ALTER TABLE deals ADD COLUMN last_readable_tp_percentage FLOAT DEFAULT 0.0;"
             "CREATE TABLE IF NOT EXISTS bots ("
             "botid INT Primary Key, "
             "next_processing_timestamp INT"
-            ")"
+            ");"
         )
 
         logger.info("Database schema upgraded for readable percentages")
@@ -1247,9 +1432,8 @@ def upgrade_trailingstoploss_tp_db():
 
     # Changes required for handling Safety Orders
     try:
-        cursor.execute("ALTER TABLE deals RENAME TO deal_profit")
-
-        cursor.execute(
+        cursor.executescript(
+            "ALTER TABLE deals RENAME TO deal_profit;"
             "CREATE TABLE IF NOT EXISTS deal_safety ("
             "dealid INT Primary Key, "
             "botid INT, "
@@ -1258,10 +1442,7 @@ def upgrade_trailingstoploss_tp_db():
             "next_so_percentage FLOAT, "
             "filled_so_count INT, "
             "shift_percentage FLOAT "
-            ")"
-        )
-
-        cursor.execute(
+            ");"
             "CREATE TABLE IF NOT EXISTS pending_orders ("
             "dealid INT Primary Key, "
             "botid INT, "
@@ -1270,13 +1451,25 @@ def upgrade_trailingstoploss_tp_db():
             "number_of_so INT, "
             "next_so_percentage FLOAT, "
             "shift_percentage FLOAT "
-            ")"
+            ");"
         )
 
         logger.info("Database schema upgraded for safety orders")
     except sqlite3.OperationalError:
         logger.debug("Database schema up-to-date for safety orders")
 
+    # Indexes for the lookups and cleanup of deals per bot, and pending orders by order id
+    cursor.executescript(
+        "CREATE INDEX IF NOT EXISTS idx_deal_profit_botid_dealid "
+        "ON deal_profit (botid, dealid);"
+        "CREATE INDEX IF NOT EXISTS idx_deal_safety_botid_dealid "
+        "ON deal_safety (botid, dealid);"
+        "CREATE INDEX IF NOT EXISTS idx_pending_orders_botid_dealid "
+        "ON pending_orders (botid, dealid);"
+        "CREATE INDEX IF NOT EXISTS idx_pending_orders_order_id "
+        "ON pending_orders (order_id);"
+    )
+
 
 # Start application
 program = Path(__file__).stem
@@ -1291,6 +1484,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# Cache of the parsed configuration, refreshed when the file changes
+configcache = {
+    "mtime": None,
+    "config": None,
+}
+
 # Create or load configuration file
 config = load_config()
 if not config:
@@ -1342,11 +1541,27 @@ cursor = db.cursor()
 # Upgrade the database if needed
 upgrade_trailingstoploss_tp_db()
 
+# Read-only connection for reading committed data, which in WAL mode does not
+# have to wait for the connection used for writing. Data which is changed within
+# the current transaction must be read using the connection for writing
+readonlydb = open_tsl_db_readonly()
+readonlycursor = readonlydb.cursor()
+
+# Next processing time per bot, kept in memory to prevent a query per bot per interval
+botnextprocesstimes = load_bot_next_process_times()
+
+# Sections and bots to process, rebuilt when the config file has been changed
+botplan = build_bot_plan(config)
+
 # TrailingStopLoss and TakeProfit %
 while True:
 
-    config = load_config()
-    logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")
+    # Reload config file, which is only parsed again when it has been changed
+    loadedconfig = load_config()
+    if loadedconfig is not config:
+        config = loadedconfig
+        botplan = build_bot_plan(config)
+        logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")
 
     # Configuration settings
     checkinterval = int(config.get("settings", "check-interval"))
@@ -1362,71 +1577,72 @@ while True:
     # Current time to determine which bots to process
     starttime = int(time.time())
 
-    for section in config.sections():
-        if section.startswith("tsl_tp_"):
-            # Bot configuration for section
-            botids = json.loads(config.get(section, "botids"))
+    # Bots from the config, used to determine when the next bot must be processed
+    configuredbots = []
 
-            # Get and check the profit-config for this section
-            sectionprofitconfig = json.loads(config.get(section, "profit-config"))
-            sectionsafetyconfig = json.loads(config.get(section, "safety-config"))
-            sectionsafetymode = config.get(section, "safety-mode")
+    for plan in botplan:
+        # Walk through all bots configured
+        for bot in plan["botids"]:
+            configuredbots.append(bot)
+            nextprocesstime = get_bot_next_process_time(bot)
 
-            #TODO: add the 'shift' option in the future
-            if sectionsafetymode.lower() not in ("merge"):
-                logger.warning(
-                    f"Section {section} has an invalid \'safety-mode\'. Skipping this section!"
+            # Only process the bot if it's time for the next interval, or
+            # time exceeds the check interval (clock has changed somehow)
+            if starttime >= nextprocesstime or (
+                    abs(nextprocesstime - starttime) > checkinterval
+            ):
+                boterror, botdata = api.request(
+                    entity="bots",
+                    action="show",
+                    action_id=str(bot),
                 )
-                continue
-
-            # Walk through all bots configured
-            for bot in botids:
-                nextprocesstime = get_next_process_time(db, "bots", "botid", bot)
-
-                # Only process the bot if it's time for the next interval, or
-                # time exceeds the check interval (clock has changed somehow)
-                if starttime >= nextprocesstime or (
-                        abs(nextprocesstime - starttime) > checkinterval
-                ):
-                    boterror, botdata = api.request(
-                        entity="bots",
-                        action="show",
-                        action_id=str(bot),
-                    )
-                    if botdata:
-                        try:
+                if botdata:
+                    try:
+                        # Commit all changes of the deals of this bot, and the
+                        # next processing time, in one transaction. The database
+                        # helpers leave committing to this block on purpose
+                        with db:
                             bot_deals_to_monitor = process_deals(
-                                botdata, sectionprofitconfig, sectionsafetyconfig, sectionsafetymode
+                                botdata, plan["profit-config"], plan["safety-config"],
+                                plan["safety-mode"]
                             )
 
                             # Determine new time to process this bot, based on the monitored deals
                             newtime = starttime + (
                                 checkinterval if bot_deals_to_monitor == 0 else monitorinterval
                             )
-                            set_next_process_time(db, "bots", "botid", bot, newtime)
-
-                            deals_to_monitor += bot_deals_to_monitor
-                        except Exception as err:
-                            logger.error(err)
-                            logger.error(traceback.print_exc())
-                            logger.error(traceback.print_tb(err.__traceback__))
-                            sys.exit(0)
-                    else:
-                        if boterror and "msg" in boterror:
-                            logger.error(f"Error occurred updating bots: {boterror['msg']}")
-                        else:
-                            logger.error("Error occurred updating bots")
+                            set_bot_next_process_time(bot, newtime)
+
+                        deals_to_monitor += bot_deals_to_monitor
+                    except Exception as err:
+                        logger.error(err)
+                        logger.error(traceback.print_exc())
+                        logger.error(traceback.print_tb(err.__traceback__))
+                        sys.exit(0)
                 else:
-                    logger.debug(
-                        f"Bot {bot} will be processed after "
-                        f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
-                    )
-        elif section not in ("settings"):
-            logger.warning(
-                f"Section '{section}' not processed (prefix 'tsl_tp_' missing)!",
-                False
-            )
+                    if boterror and "msg" in boterror:
+                        logger.error(f"Error occurred updating bots: {boterror['msg']}")
+                    else:
+                        logger.error("Error occurred updating bots")
+
+                    # Retry the bot after the check interval, instead of on every loop
+                    with db:
+                        set_bot_next_process_time(bot, starttime + checkinterval)
+            else:
+                logger.debug(
+                    f"Bot {bot} will be processed after "
+                    f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
+                )
 
+    # Sleep until the first bot must be processed again, with the interval as maximum
     timeint = checkinterval if deals_to_monitor == 0 else monitorinterval
+    currenttime = int(time.time())
+    nextprocesstimes = [
+        botnextprocesstimes[bot] for bot in configuredbots
+        if botnextprocesstimes.get(bot, 0) > currenttime
+    ]
+    if nextprocesstimes:
+        timeint = min(timeint, min(nextprocesstimes) - currenttime)
+
     if not wait_time_interval(logger, notification, timeint, False):
         break
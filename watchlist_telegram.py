@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import argparse
+import ast
+from concurrent.futures import ThreadPoolExecutor
 import configparser
+from functools import partial
 import json
 from math import nan
 import os
@@ -12,7 +15,7 @@ from pathlib import Path
 
 from telethon import TelegramClient, events
 
-from helpers.logging import Logger, NotificationHandler
+from helpers.logging import NOTIFICATION_BATCH_SECONDS, Logger, NotificationHandler
 from helpers.smarttrade import (
     construct_smarttrade_position,
     construct_smarttrade_stoploss,
@@ -34,6 +37,31 @@ from helpers.watchlist import (
     process_botlist
 )
 
+# Exchanges supported for custom trigger messages
+CUSTOM_EXCHANGES = ("binance", "ftx", "kucoin")
+
+# Layout of a custom trigger message: exchange, (#)BASE_COIN and trade on separate lines
+CUSTOM_TRIGGER_REGEX = re.compile(r"[^\n]+\n#?[^\n_]*_[^\n]+\n[^\n]+")
+
+# Exchanges and (lowercase) bases supported for Hodloo
+HODLOO_EXCHANGES = ("Bittrex", "Binance", "Kucoin")
+HODLOO_BASES = ("bnb", "btc", "busd", "eth", "eur", "usdt")
+
+# Price in a smarttrade message, like 0.1175, 1,354, 25.5k or 493
+PRICE_REGEX = re.compile(r"(?P<price>[0-9]{1,5}[.,]\d{1,8}|[0-9]{2,})(?P<k>k?)")
+
+# Coin in a hashtag, like #SAND or #BTC/USDT
+HASHTAG_COIN_REGEX = re.compile(r"#(?P<coin>[A-Za-z0-9]+)")
+
+# Words which indicate a message contains a smarttrade, searched for in one pass
+SMARTTRADE_TRIGGER_REGEX = re.compile(r"Targets|Target 1|TP1|SL")
+
+# Type of a line in a smarttrade message, found by the name of the matching group. The
+# alternatives are tried in this order, so a line containing a pair is always a pair line
+SMARTTRADE_LINE_REGEX = re.compile(
+    r"(?=.*(?P<pair>/USDT|/BTC|#))|(?=.*(?P<target>Target))|(?=.*(?P<stoploss>Stoploss|SL:))"
+)
+
 
 def load_config():
     """Create default or load existing config file."""
@@ -63,7 +91,7 @@ def load_config():
     }
 
     cfg["smarttrade"] = {
-        "channel-names": ["Channel 1", "Channel 2"],
+        "channel-names": json.dumps(["Channel 1", "Channel 2"]),
         "amount-usdt": 100.0,
         "amount-btc": 0.001,
     }
@@ -97,58 +125,107 @@ def load_config():
 def upgrade_config(cfg):
     """Upgrade config file if needed."""
 
+    # The file is only written when something has been upgraded, and then only once
+    changed = False
+
     if not cfg.has_section("smarttrade"):
         cfg["smarttrade"] = {
-            "channel-names": ["Channel 1", "Channel 2"],
+            "channel-names": json.dumps(["Channel 1", "Channel 2"]),
             "amount-usdt": 100.0,
             "amount-btc": 0.001,
         }
-
-        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
-            cfg.write(cfgfile)
+        changed = True
 
         logger.info("Upgraded the configuration file (added smarttrade section)")
 
     if not cfg.has_option("settings", "3c-apikey-path"):
         cfg.set("settings", "3c-apikey-path", "")
+        changed = True
+
+        logger.info("Upgraded the configuration file (3c-apikey-path)")
 
+    # Older config files contain the channel names as a Python list, like
+    # ['Channel 1', 'Channel 2'], which is rewritten as a JSON list. Invalid
+    # values are left as they are and reported at startup
+    channelnames = cfg.get("smarttrade", "channel-names")
+    channellist = parse_channel_names(channelnames)
+    if channellist is not None:
+        try:
+            currentlist = json.loads(channelnames)
+        except ValueError:
+            currentlist = None
+
+        if currentlist != channellist:
+            cfg.set("smarttrade", "channel-names", json.dumps(channellist))
+            changed = True
+
+            logger.info("Upgraded the configuration file (smarttrade channel-names)")
+
+    if changed:
         with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
             cfg.write(cfgfile)
 
-        logger.info("Upgraded the configuration file (3c-apikey-path)")
-
     return cfg
 
 
+def parse_channel_names(value):
+    """Parse the smarttrade channel names into a list, or None when invalid."""
+
+    try:
+        names = json.loads(value)
+    except ValueError:
+        try:
+            names = ast.literal_eval(value)
+        except (ValueError, SyntaxError, TypeError):
+            names = value
+
+    # A single channel name is allowed as well
+    if isinstance(names, str):
+        names = [names]
+
+    if isinstance(names, (list, tuple)) and all(isinstance(name, str) for name in names):
+        return list(names)
+
+    return None
+
+
 async def handle_custom_event(event):
     """Handle the received Telegram event"""
 
-    logger.debug(
-        "Received custom message '%s'"
-        % (event.message.text.replace("\n", " - "))
-    )
+    if logger.is_debug_enabled():
+        logger.debug(
+            "Received custom message '%s'"
+            % (event.message.text.replace("\n", " - "))
+        )
+
+    # Reject other messages in the channel before splitting and parsing them
+    if not CUSTOM_TRIGGER_REGEX.match(event.raw_text):
+        logger.debug("Invalid trigger message format!")
+        return
 
     # Parse the event and do some error checking
     trigger = event.raw_text.splitlines()
 
     try:
-        exchange = trigger[0].replace("\n", "")
-        pair = trigger[1].replace("#", "").replace("\n", "")
-        base = pair.split("_")[0].replace("#", "").replace("\n", "")
-        coin = pair.split("_")[1].replace("\n", "")
+        # Lines from splitlines() never contain a newline, so only the '#' is removed
+        exchange = trigger[0]
+        pair = trigger[1].replace("#", "")
+        pairparts = pair.split("_")
+        base = pairparts[0]
+        coin = pairparts[1]
 
         # Fix for future pair format
         if coin.endswith(base) and len(coin) > len(base):
             coin = coin.replace(base, "")
 
-        trade = trigger[2].replace("\n", "")
+        trade = trigger[2]
         if trade == "LONG" and len(trigger) == 4 and trigger[3] == "CLOSE":
             trade = "CLOSE"
     except IndexError:
         logger.debug("Invalid trigger message format!")
         return
 
-    if exchange.lower() not in ("binance", "ftx", "kucoin"):
+    if exchange.lower() not in CUSTOM_EXCHANGES:
         logger.debug(
             f"Exchange '{exchange}' is not yet supported."
         )
@@ -159,14 +236,14 @@ async def handle_custom_event(event):
         return
 
     if base == "USDT":
-        botids = json.loads(config.get("custom", "usdt-botids"))
+        botids = get_botids("custom", "usdt-botids")
         if len(botids) == 0:
             logger.debug(
                 "No valid usdt-botids configured for '%s', disabled" % base
             )
             return
     elif base == "BTC":
-        botids = json.loads(config.get("custom", "btc-botids"))
+        botids = get_botids("custom", "btc-botids")
         if len(botids) == 0:
             logger.debug("No valid btc-botids configured for '%s', disabled" % base)
             return
@@ -195,9 +272,7 @@ async def handle_telegram_smarttrade_event(source, event):
     data = event.raw_text.splitlines()
 
     try:
-        searchwords = ["Targets", "Target 1", "TP1", "SL"]
-        #if "Targets" in event.message.text:
-        if any(word in event.message.text for word in searchwords):
+        if SMARTTRADE_TRIGGER_REGEX.search(event.message.text):
             logger.debug(f"Received {source} message: {data}", True)
 
             parse_smarttrade_event(source, data)
@@ -221,11 +296,16 @@ def parse_smarttrade_event(source, event_data):
     logger.info(f"Parsing received event from '{source}': {event_data}")
 
     for event_line in event_data:
-        if "/USDT" in event_line or "/BTC" in event_line or "#" in event_line:
+        linematch = SMARTTRADE_LINE_REGEX.match(event_line)
+        if linematch is None:
+            continue
+
+        linetype = linematch.lastgroup
+        if linetype == "pair":
             pair = parse_smarttrade_pair(event_line)
-        elif "Target" in event_line:
+        elif linetype == "target":
             targets = parse_smarttrade_target(event_line)
-        elif "Stoploss" in event_line or "SL:" in event_line:
+        else:
             stoploss = parse_smarttrade_stoploss(event_line)
 
     logger.info(
@@ -242,9 +322,7 @@ def parse_smarttrade_event(source, event_data):
     )
 
     if is_valid_smarttrade(logger, currentprice, entries, targets, stoploss, direction):
-        amount = config.getfloat("smarttrade", "amount-usdt")
-        if "BTC" in pair:
-            amount = config.getfloat("smarttrade", "amount-btc")
+        amount = smarttradeamountbtc if "BTC" in pair else smarttradeamountusdt
 
         positionsize = amount
         if not ("USDT" in pair and "BTC" in pair):
@@ -300,28 +378,18 @@ def handle_open_smarttrade_data(data):
 def parse_smarttrade_pair(data):
     """Parse data and extract pair data"""
 
-    pair = None
     coin = None
 
     if "/USDT" in data or "/BTC" in data:
-        pairdata = data.split(" ")[0].split("/")
-        base = pairdata[1].replace("#", "")
-        coin = pairdata[0].replace("#", "")
+        pairdata = data.split(" ")[0].replace("#", "").split("/")
+        base = pairdata[1]
+        coin = pairdata[0]
     elif "#" in data:
         base = "USDT"
-        pairdata = data.split(" ")
-        logger.info(f"Parsing pairdata {pairdata}")
-
-        for line in pairdata:
-            if "#" in line:
-                coinorpair = line.replace("#", "")
 
-                if "/" in coinorpair:
-                    coin = coinorpair.split('/')[0]
-                else:
-                    coin = coinorpair
-
-                break
+        coinmatch = HASHTAG_COIN_REGEX.search(data)
+        if coinmatch is not None:
+            coin = coinmatch["coin"]
 
     pair = f"{base}_{coin}"
 
@@ -334,16 +402,27 @@ def parse_smarttrade_entrie(data):
     """Parse data and extract entrie(s) data"""
 
 
+def convert_price(price_match, multiplier):
+    """Convert a price matched by PRICE_REGEX to a float"""
+
+    price = float(price_match["price"].replace(",", ".")) * multiplier
+    if price_match["k"]:
+        price *= 1000.0
+
+    return price
+
+
 def parse_smarttrade_target(data):
     """Parse data and extract target(s) data"""
 
     targetsteps = list()
 
-    convertsatoshi = False
-    if "satoshi" in data:
-        convertsatoshi = True
+    multiplier = 0.00000001 if "satoshi" in data else 1.0
 
-    tpdata = re.findall(r"[0-9]{1,5}[.,]\d{1,8}k?|[0-9]{2,}k?", data.split("(")[0])
+    tpdata = [
+        convert_price(pricematch, multiplier)
+        for pricematch in PRICE_REGEX.finditer(data.split("(")[0])
+    ]
 
     quotient, remainder = divmod(100, len(tpdata))
 
@@ -351,27 +430,19 @@ def parse_smarttrade_target(data):
         f"Calculated quotient of {quotient} and remainder {remainder} based on len {len(tpdata)}"
     )
 
-    for takeprofit in tpdata:
+    for price in tpdata:
         step = {}
 
-        price = takeprofit
-        if convertsatoshi:
-            price = float(price) * 0.00000001
-        if isinstance(price, str) and "k" in price:
-            price = float(price.replace("k", ""))
-            price *= 1000.0
-
         step["price"] = price
-
-        # Volume is calculated based on number of targets. This could be a float result and result in a volume of less
-        # than 100% due to rounding. So, the quetient is calculated for every target and the remaining volume is added
-        # to the first target
         step["volume"] = quotient
-        if len(targetsteps) == 0:
-            step["volume"] += remainder
 
         targetsteps.append(step)
 
+    # Volume is calculated based on number of targets. This could be a float result and result in a volume of less
+    # than 100% due to rounding. So, the quetient is calculated for every target and the remaining volume is added
+    # to the first target
+    targetsteps[0]["volume"] += remainder
+
     logger.info(f"Targets '{targetsteps}' found in {data} (regex returned {tpdata}).")
 
     return targetsteps
@@ -382,14 +453,9 @@ def parse_smarttrade_stoploss(data):
 
     stoploss = nan
 
-    sldata = re.search(r"[0-9]{1,5}[.,]\d{1,8}k?|[0-9]{2,}k?", data)
+    sldata = PRICE_REGEX.search(data)
     if sldata is not None:
-        stoploss = sldata.group()
-        if "k" in stoploss:
-            stoploss = float(stoploss.replace("k", ""))
-            stoploss *= 1000.0
-        else:
-            stoploss = float(stoploss)
+        stoploss = convert_price(sldata, 1.0)
 
     logger.info(f"Stoploss of '{stoploss}' found in {data} (regex returned {sldata}).")
 
@@ -407,15 +473,16 @@ async def handle_hodloo_event(category, event):
     # Parse the event and do some error checking
     trigger = event.raw_text.splitlines()
 
-    pair = trigger[0].replace("\n", "").replace("**", "")
-    base = pair.split("/")[1]
-    coin = pair.split("/")[0]
+    pair = trigger[0].replace("**", "")
+    pairparts = pair.split("/")
+    base = pairparts[1]
+    coin = pairparts[0]
 
     logger.info(
         f"Received message on {category}% for {base}_{coin}"
     )
 
-    if base.lower() not in ("bnb", "btc", "busd", "eth", "eur", "usdt"):
+    if base.lower() not in HODLOO_BASES:
         logger.debug(
             f"{base}_{coin}: base '{base}' is not yet supported."
         )
@@ -435,10 +502,21 @@ async def handle_hodloo_event(category, event):
     )
 
 
+def get_botids(section, option):
+    """Get list of botids from configuration, parsed only the first time"""
+
+    botids = botidscache.get((section, option))
+    if botids is None:
+        botids = json.loads(config.get(section, option))
+        botidscache[(section, option)] = botids
+
+    return botids
+
+
 def get_hodloo_botids(category, base):
     """Get list of botids from configuration based on category and base"""
 
-    return json.loads(config.get(f"hodloo_{category}", f"{base.lower()}-botids"))
+    return get_botids(f"hodloo_{category}", f"{base.lower()}-botids")
 
 
 def run_tests():
@@ -537,11 +615,15 @@ else:
         )
         time.tzset()
 
+    # Used by both the notification handler and the logger
+    notificationsenabled = config.getboolean("settings", "notifications")
+
     # Init notification handler
     notification = NotificationHandler(
         program,
-        config.getboolean("settings", "notifications"),
+        notificationsenabled,
         config.get("settings", "notify-urls"),
+        NOTIFICATION_BATCH_SECONDS,
     )
 
     # Initialise logging
@@ -551,7 +633,7 @@ else:
         notification,
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
-        config.getboolean("settings", "notifications"),
+        notificationsenabled,
     )
 
 # Upgrade config file if needed
@@ -559,19 +641,29 @@ config = upgrade_config(config)
 
 # Validation of data before starting
 hl5exchange = config.get("hodloo_5", "exchange")
-if hl5exchange not in ("Bittrex", "Binance", "Kucoin"):
+if hl5exchange not in HODLOO_EXCHANGES:
     logger.error(
         f"Exchange {hl5exchange} not supported. Must be 'Bittrex', 'Binance' or 'Kucoin'!"
     )
     sys.exit(0)
 
 hl10exchange = config.get("hodloo_10", "exchange")
-if hl10exchange not in ("Bittrex", "Binance", "Kucoin"):
+if hl10exchange not in HODLOO_EXCHANGES:
     logger.error(
         f"Exchange {hl10exchange} not supported. Must be 'Bittrex', 'Binance' or 'Kucoin'!"
     )
     sys.exit(0)
 
+# Smarttrade channel titles, as set for a fast lookup per dialog
+smarttradechannellist = parse_channel_names(config.get("smarttrade", "channel-names"))
+if smarttradechannellist is None:
+    logger.error(
+        "Smarttrade 'channel-names' must be a list of channel names, "
+        "like [\"Channel 1\", \"Channel 2\"]!"
+    )
+    sys.exit(0)
+smarttradechannels = frozenset(smarttradechannellist)
+
 # Initialize 3Commas API
 api = init_threecommas_api(logger, config)
 if not api:
@@ -581,19 +673,26 @@ if not api:
 #run_tests()
 #sys.exit(0)
 
-# Prefetch marketcodes for all bots
+# Parsed botids per section and option, the config is not reloaded while running
+botidscache = {}
+
+# Prefetch marketcodes for all bots, a bot used for multiple sources only once
 # - Custom bots
-allbotids = json.loads(config.get("custom", "usdt-botids")) + json.loads(config.get("custom", "btc-botids"))
+allbotids = set(get_botids("custom", "usdt-botids"))
+allbotids.update(get_botids("custom", "btc-botids"))
 
 # - Hodloo bots
 for hlcategory in ("5", "10"):
-    for hlbase in ("bnb", "btc", "busd", "eth", "eur", "usdt"):
-        allbotids += get_hodloo_botids(hlcategory, hlbase)
+    for hlbase in HODLOO_BASES:
+        allbotids.update(get_hodloo_botids(hlcategory, hlbase))
 
-marketcodecache = prefetch_marketcodes(logger, api, allbotids)
+# Prefetch marketcodes and blacklists at the same time, both are waiting on 3Commas
+with ThreadPoolExecutor(max_workers=2) as executor:
+    marketcodefuture = executor.submit(prefetch_marketcodes, logger, api, allbotids)
+    blacklistfuture = executor.submit(load_blacklist, logger, api, blacklistfile)
 
-# Prefetch blacklists
-blacklist = load_blacklist(logger, api, blacklistfile)
+    marketcodecache = marketcodefuture.result()
+    blacklist = blacklistfuture.result()
 
 # Watchlist telegram trigger
 client = TelegramClient(
@@ -605,7 +704,27 @@ client = TelegramClient(
 customchannelname = config.get("custom", "channel-name")
 hl5channelname = f"Hodloo {hl5exchange} 5%"
 hl10channelname = f"Hodloo {hl10exchange} 10%"
-smarttradechannels = config.get("smarttrade", "channel-names")
+
+# Smarttrade amounts, read once because the config is not reloaded while running
+smarttradeamountusdt = config.getfloat("smarttrade", "amount-usdt")
+smarttradeamountbtc = config.getfloat("smarttrade", "amount-btc")
+
+# Event handler per channel title, so each dialog takes a single lookup. Filled from
+# lowest to highest priority, in case multiple settings use the same title
+channelhandlers = {
+    title: partial(handle_telegram_smarttrade_event, title) for title in smarttradechannels
+}
+channelhandlers.update({
+    hl10channelname: partial(handle_hodloo_event, "10"),
+    hl5channelname: partial(handle_hodloo_event, "5"),
+    customchannelname: handle_custom_event,
+})
+
+# Event handler per chat id of the channels to listen to
+listenchats = {}
+
+# Titles not found yet, the scan stops when all configured channels are found
+remainingtitles = set(channelhandlers)
 
 for dialog in client.iter_dialogs():
     if dialog.is_channel:
@@ -613,54 +732,31 @@ for dialog in client.iter_dialogs():
             f"{dialog.id}:{dialog.title}"
         )
 
-        if dialog.title == customchannelname:
-            logger.info(f"Listening to updates from '{dialog.title}' (id={dialog.id}) ...",
-                True
-            )
-            @client.on(events.NewMessage(chats=dialog.id))
-            async def callback_custom(event):
-                """Receive Telegram message."""
-
-                await handle_custom_event(event)
-                notification.send_notification()
-
-        elif dialog.title == hl5channelname:
-            logger.info(f"Listening to updates from '{dialog.title}' (id={dialog.id}) ...",
-                True
-            )
-            @client.on(events.NewMessage(chats=dialog.id))
-            async def callback_5(event):
-                """Receive Telegram message."""
+        channelhandler = channelhandlers.get(dialog.title)
+        if channelhandler is None:
+            continue
 
-                await handle_hodloo_event("5", event)
-                notification.send_notification()
+        logger.info(f"Listening to updates from '{dialog.title}' (id={dialog.id}) ...",
+            True
+        )
 
-        elif dialog.title == hl10channelname:
-            logger.info(f"Listening to updates from '{dialog.title}' (id={dialog.id}) ...",
-                True
-            )
-            @client.on(events.NewMessage(chats=dialog.id))
-            async def callback_10(event):
-                """Receive Telegram message."""
+        listenchats[dialog.id] = channelhandler
 
-                await handle_hodloo_event("10", event)
-                notification.send_notification()
+        remainingtitles.discard(dialog.title)
+        if not remainingtitles:
+            break
 
-        elif dialog.title in smarttradechannels:
-            logger.info(f"Listening to updates from '{dialog.title}' (id={dialog.id}) ...",
-                True
-            )
-            @client.on(events.NewMessage(chats=dialog.id))
-            async def callback_smarttrade(event):
-                """Receive Telegram message."""
+# One handler for all channels, so Telethon checks a single filter per message
+if listenchats:
+    @client.on(events.NewMessage(chats=list(listenchats)))
+    async def callback(event):
+        """Receive Telegram message."""
 
-                chat_from = event.chat if event.chat else (await event.get_chat()) # telegram MAY not send the chat enity
-                await handle_telegram_smarttrade_event(chat_from.title, event)
-                notification.send_notification()
+        await listenchats[event.chat_id](event)
+        notification.send_notification()
 
 
-# Start telegram client
-client.start()
+# Telegram client has already been started when it was created
 logger.info(
     "Client started listening to updates on mentioned channels...",
     True